@@ -3,6 +3,11 @@ from tkinter import messagebox
 from graphviz import Digraph
 from PIL import Image, ImageTk
 import os
+import re
+import hashlib
+import threading
+from array import array
+from fsm_numba import DEAD, make_dfa_runner, make_nfa_runner
 
 class TransitionError(Exception):
     """Custom exception for transition validation errors."""
@@ -12,13 +17,30 @@ class InputError(Exception):
     """Custom exception for input string validation errors."""
     pass
 
+# One transition per line: "state,symbol -> next_state". Fields may contain inner
+# spaces and come back stripped; only the separators are excluded.
+_TRANSITION_RE = re.compile(r'^\s*([^,]*?)\s*,\s*([^,]*?)\s*->\s*(.*?)\s*$')
+
+# Source for the DFA runner FiniteAutomaton generates when numba is unavailable
+_DFA_RUN_TEMPLATE = """
+def run(s, T={table!r}, accept={accept!r}):
+    state = {start!r}
+    for c in s:
+        state = T[state].get(c, {dead!r})
+        if state == {dead!r}:
+            return False
+    return state in accept
+"""
+
 class FiniteAutomaton:
     def __init__(self, states, alphabet, transitions, start_state, accept_states):
         self.states = states
         self.alphabet = alphabet
         self.transitions = transitions
         self.start_state = start_state
-        self.accept_states = accept_states
+        self.accept_states = frozenset(accept_states)
+        # Unordered view of the ordered alphabet list for set operations
+        self._alphabet_set = frozenset(alphabet)
         
         # First check if it's a DFA to determine validation strategy
         self.is_dfa = self.check_if_dfa()
@@ -26,18 +48,164 @@ class FiniteAutomaton:
         if self.is_dfa:
             self.validate_transitions()
 
+        # Number states and symbols so simulation works on integer ids instead of dicts.
+        # States are numbered in topological order of the ε-graph's strongly connected
+        # components, so ε-linked states get neighbouring ids and table rows.
+        eps_sccs = self._epsilon_sccs()
+        id_states = [state for scc in reversed(eps_sccs) for state in scc]
+        self.state_idx = {state: i for i, state in enumerate(id_states)}
+        self.sym_idx = {symbol: j for j, symbol in enumerate(self.alphabet)}
+        self.trans_flat = [
+            [tuple(self.state_idx[t] for t in self.transitions.get(state, {}).get(symbol, ()))
+             for symbol in self.alphabet]
+            for state in id_states
+        ]
+        self._start_id = self.state_idx[self.start_state]
+
+        # State sets are bitmasks: bit i is set when state i is active
+        self._accept_bits = self._to_bits(self.state_idx[s] for s in self.accept_states)
+
+        # States that can still reach an accept state; the rest are pruned from every table
+        self._live_bits = self._live_state_bits()
+
+        # The ε-graph is fixed after construction, so compute each state's closure once
+        self._eps_closure_bits = self._epsilon_closure_bits(eps_sccs)
+        # Per-symbol move tables with the ε-closure folded in:
+        # move_bits[sym_id][state_id] -> every state reachable on that symbol, already ε-closed
+        self._move_bits = [
+            [self._closure_of_bits(self._to_bits(row[sym_id])) for row in self.trans_flat]
+            for sym_id in range(len(self.alphabet))
+        ]
+        # Lazily built DFA over NFA subsets: (state bitmask, symbol id) -> next state bitmask
+        self._lazy_dfa = {}
+
+        # DFAs get a dense table: dfa_table[state_id][sym_id] -> next state id, DEAD if missing
+        self._dfa_table = None
+        if self.is_dfa:
+            live_bits = self._live_bits
+            self._dfa_table = [[targets[0] if targets and live_bits >> targets[0] & 1 else DEAD
+                                for targets in row]
+                               for row in self.trans_flat]
+
+        # Use the Numba-compiled loop when numba is installed (None otherwise)
+        if self.is_dfa:
+            self._jit_run = make_dfa_runner(self._dfa_table, self._start_id, self._accept_bits)
+        else:
+            self._jit_run = make_nfa_runner(self._move_bits, self._eps_closure_bits[self._start_id],
+                                            self._accept_bits)
+
+        # Without numba, DFAs run through a function generated for this exact table
+        self._compiled_run = None
+        if self.is_dfa and self._jit_run is None:
+            self._compiled_run = self._compile_dfa()
+
+    @staticmethod
+    def _to_bits(state_ids):
+        """Pack an iterable of state ids into a bitmask."""
+        bits = 0
+        for i in state_ids:
+            bits |= 1 << i
+        return bits
+
+    def _live_state_bits(self):
+        """Find the states from which an accept state is reachable, as a bitmask."""
+        state_idx = self.state_idx
+        reverse = [[] for _ in state_idx]
+        for state, edges in self.transitions.items():
+            for symbol, targets in edges.items():
+                if symbol == 'ε' or symbol in self._alphabet_set:
+                    for target in targets:
+                        reverse[state_idx[target]].append(state_idx[state])
+
+        # Search backwards from every accept state at once
+        worklist = [state_idx[s] for s in self.accept_states]
+        live = self._to_bits(worklist)
+        i = 0
+        while i < len(worklist):
+            for source in reverse[worklist[i]]:
+                if not live >> source & 1:
+                    live |= 1 << source
+                    worklist.append(source)
+            i += 1
+        return live
+
+    def _epsilon_sccs(self):
+        """Find the strongly connected components of the ε-graph (Tarjan's algorithm).
+
+        Components come out in reverse topological order: every component is
+        listed after all components reachable from it.
+        """
+        eps_edges = {state: self.transitions.get(state, {}).get('ε', ()) for state in self.states}
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        sccs = []
+
+        for root in eps_edges:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            # Iterative depth-first search: (state, iterator over its ε-targets)
+            work = [(root, iter(eps_edges[root]))]
+            while work:
+                state, targets = work[-1]
+                for target in targets:
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(eps_edges[target])))
+                        break
+                    if target in on_stack:
+                        lowlink[state] = min(lowlink[state], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[state])
+                    if lowlink[state] == index[state]:
+                        scc = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            scc.append(member)
+                            if member == state:
+                                break
+                        sccs.append(scc)
+
+        return sccs
+
+    def _epsilon_closure_bits(self, eps_sccs):
+        """Compute every state's ε-closure bitmask, restricted to live states."""
+        state_idx = self.state_idx
+        closure_bits = [0] * len(state_idx)
+        # Successor components come first, so a component's closure is its own
+        # states plus the already finished closures of everything it ε-reaches
+        for scc in eps_sccs:
+            bits = self._to_bits(state_idx[state] for state in scc)
+            for state in scc:
+                for target in self.transitions.get(state, {}).get('ε', ()):
+                    bits |= closure_bits[state_idx[target]]
+            bits &= self._live_bits
+            for state in scc:
+                closure_bits[state_idx[state]] = bits
+        return closure_bits
+
     def validate_input_string(self, input_string):
         """Validate that input string only contains symbols from the alphabet."""
-        invalid_symbols = set()
-        for symbol in input_string:
-            if symbol not in self.alphabet:
-                invalid_symbols.add(symbol)
-        
-        if invalid_symbols:
-            error_msg = "Input string contains invalid symbols:\n"
-            error_msg += f"Invalid symbols: {', '.join(invalid_symbols)}\n"
-            error_msg += f"Allowed symbols (alphabet): {', '.join(self.alphabet)}"
-            raise InputError(error_msg)
+        symbols = set(input_string)
+        if symbols <= self._alphabet_set:
+            return
+
+        # Only work out the offending symbols once the string is known to be invalid
+        invalid_symbols = symbols - self._alphabet_set
+        error_msg = "Input string contains invalid symbols:\n"
+        error_msg += f"Invalid symbols: {', '.join(invalid_symbols)}\n"
+        error_msg += f"Allowed symbols (alphabet): {', '.join(self.alphabet)}"
+        raise InputError(error_msg)
 
     def validate_transitions(self):
         """Validate transitions only for DFA cases."""
@@ -46,21 +214,21 @@ class FiniteAutomaton:
             
         missing_transitions = []
         
-        # For DFAs, check each state and alphabet combination
+        # For DFAs, check each non-accept state against the whole alphabet
         for state in self.states:
             # Skip validation for accept states
             if state in self.accept_states:
                 continue
-                
-            if state not in self.transitions:
-                # State has no transitions at all
-                missing_transitions.extend([f"({state}, {symbol})" for symbol in self.alphabet])
-                continue
-                
-            for symbol in self.alphabet:
-                if symbol not in self.transitions[state]:
-                    missing_transitions.append(f"({state}, {symbol})")
-                elif len(self.transitions[state][symbol]) != 1:
+
+            state_transitions = self.transitions.get(state, {})
+            missing = self._alphabet_set - state_transitions.keys()
+            if missing:
+                # Report in alphabet order; only reached when something is wrong
+                missing_transitions.extend(f"({state}, {symbol})" for symbol in self.alphabet
+                                           if symbol in missing)
+
+            for symbol, targets in state_transitions.items():
+                if symbol in self._alphabet_set and len(targets) != 1:
                     # For DFAs, each state-symbol pair should have exactly one next state
                     missing_transitions.append(f"({state}, {symbol}) - multiple transitions not allowed in DFA")
         
@@ -70,60 +238,129 @@ class FiniteAutomaton:
             raise TransitionError(error_msg)
 
     def check_if_dfa(self):
-        """Check if the automaton is a DFA."""
-        # If there are any epsilon transitions, it's not a DFA
+        """Check if the automaton is a DFA in a single pass over the states."""
+        transitions = self.transitions
+        alphabet_set = self._alphabet_set
+        accept_states = self.accept_states
+
         for state in self.states:
-            if state in self.transitions:
-                if 'ε' in self.transitions[state]:
+            state_transitions = transitions.get(state, {})
+            # If there are any epsilon transitions, it's not a DFA
+            if 'ε' in state_transitions:
+                return False
+            # Check if any symbol has multiple transitions
+            for targets in state_transitions.values():
+                if len(targets) > 1:
                     return False
-                # Check if any symbol has multiple transitions
-                for symbol in self.transitions[state]:
-                    if len(self.transitions[state][symbol]) > 1:
-                        return False
-        
-        return all(
-            state in self.transitions and
-            all(symbol in self.transitions[state] for symbol in self.alphabet)
-            for state in self.states if state not in self.accept_states
-        )
+            # Non-accept states need a transition on every symbol
+            if state not in accept_states and not alphabet_set <= state_transitions.keys():
+                return False
+
+        return True
 
     def get_epsilon_closure(self, states):
-        """Calculate epsilon closure for a set of states."""
+        """Calculate epsilon closure for a set of states.
+
+        Public helper over state names. simulate() does not call it; it uses the
+        bitmask closures built from the ε-graph SCCs in __init__.
+        """
+        transitions = self.transitions
         closure = set(states)
-        stack = list(states)
-        
-        while stack:
-            state = stack.pop()
-            if state in self.transitions and 'ε' in self.transitions[state]:
-                for next_state in self.transitions[state]['ε']:
-                    if next_state not in closure:
-                        closure.add(next_state)
-                        stack.append(next_state)
-        
+        worklist = list(closure)
+
+        # Indexed worklist: each state is appended once and never popped
+        i = 0
+        while i < len(worklist):
+            state = worklist[i]
+            i += 1
+            for next_state in transitions.get(state, {}).get('ε', ()):
+                if next_state not in closure:
+                    closure.add(next_state)
+                    worklist.append(next_state)
+
         return closure
 
+    def _closure_of_bits(self, bits):
+        """Union the precomputed ε-closures of every state in a bitmask."""
+        eps_closure_bits = self._eps_closure_bits
+        closure = 0
+        while bits:
+            low = bits & -bits
+            closure |= eps_closure_bits[low.bit_length() - 1]
+            bits ^= low
+        return closure
+
+    def _step(self, current, sym_id):
+        """Compute the ε-closed state set reached from current on one symbol."""
+        move = self._move_bits[sym_id]
+        # Visit only the set bits of the current state set
+        next_bits = 0
+        while current:
+            low = current & -current
+            next_bits |= move[low.bit_length() - 1]
+            current ^= low
+        return next_bits
+
+    def _compile_dfa(self):
+        """Generate a DFA runner with the transition table baked in as constants."""
+        # One dict per state keyed by input character; missing transitions are absent
+        table = tuple(
+            {symbol: target for symbol, target in zip(self.alphabet, row) if target != DEAD}
+            for row in self._dfa_table
+        )
+        accept = frozenset(i for i in range(len(table)) if self._accept_bits >> i & 1)
+        source = _DFA_RUN_TEMPLATE.format(table=table, accept=accept, start=self._start_id, dead=DEAD)
+
+        namespace = {}
+        exec(source, namespace)
+        return namespace["run"]
+
     def simulate(self, input_string):
         # First validate the input string
         self.validate_input_string(input_string)
+
+        # Nothing accepting is reachable from the start state
+        if not self._live_bits >> self._start_id & 1:
+            return False
         
-        current_states = self.get_epsilon_closure({self.start_state})
+        if self._compiled_run is not None:
+            return self._compiled_run(input_string)
 
-        for symbol in input_string:
-            next_states = set()
-            for state in current_states:
-                if state in self.transitions and symbol in self.transitions[state]:
-                    next_states.update(self.transitions[state][symbol])
-            
-            next_states = self.get_epsilon_closure(next_states)
-            
-            if not next_states:
+        # Translate the input to symbol ids once, then run the loop over ints only
+        symbols = array('i', map(self.sym_idx.__getitem__, input_string))
+        if self._jit_run is not None:
+            return self._jit_run(symbols)
+
+        lazy_dfa = self._lazy_dfa
+
+        current = self._eps_closure_bits[self._start_id]
+
+        for sym_id in symbols:
+            # Each (subset, symbol) pair is only worked out once per automaton
+            key = (current, sym_id)
+            next_bits = lazy_dfa.get(key)
+            if next_bits is None:
+                next_bits = lazy_dfa[key] = self._step(current, sym_id)
+
+            if not next_bits:
                 return False
 
-            current_states = next_states
+            current = next_bits
+
+        return bool(current & self._accept_bits)
 
-        return bool(current_states & self.accept_states)
+    def render_key(self):
+        """Return a stable digest of everything that affects the rendered graph."""
+        description = repr((list(self.states), self.transitions,
+                            self.start_state, sorted(self.accept_states)))
+        return hashlib.sha1(description.encode("utf-8")).hexdigest()[:16]
 
     def visualize(self, filename="automaton"):
+        # Reuse the PNG from an earlier render of the same automaton
+        graph_name = f"{filename}_{self.render_key()}"
+        if os.path.exists(f"{graph_name}.png"):
+            return f"{graph_name}.png"
+
         dot = Digraph()
         dot.attr(rankdir="LR")
         dot.attr("node", shape="circle")
@@ -142,8 +379,13 @@ class FiniteAutomaton:
                 for next_state in next_states:
                     dot.edge(state, next_state, label=symbol)
 
-        dot.render(filename, format="png", cleanup=True)
-        return f"{filename}.png"
+        # Render under a name private to this call, then move the PNG into place
+        # atomically, so concurrent renders never share a source file and the
+        # existence check above only ever sees complete images
+        temp_name = f"{graph_name}.{os.getpid()}.{threading.get_ident()}"
+        dot.render(temp_name, format="png", cleanup=True)
+        os.replace(f"{temp_name}.png", f"{graph_name}.png")
+        return f"{graph_name}.png"
 
 
 class FiniteAutomatonGUI:
@@ -203,6 +445,11 @@ class FiniteAutomatonGUI:
         self.graph_label = Label(root)
         self.graph_label.pack()
 
+        # Rendered graphs keyed by file name, reused across simulations
+        self._image_cache = {}
+        # Bumped per simulation so an outdated render never replaces a newer graph
+        self._render_generation = 0
+
     def validate_basic_inputs(self):
         """Validate the basic inputs before processing transitions."""
         # Get and validate states
@@ -233,35 +480,28 @@ class FiniteAutomatonGUI:
 
         return states, alphabet, start_state, accept_states
 
-    def parse_transitions(self, text):
+    def parse_transitions(self, text, state_set, alphabet_set):
+        """Parse transition lines against the already validated states and alphabet."""
         transitions = {}
-        state_set = set(s.strip() for s in self.states_entry.get().split(','))
-        alphabet_set = set(s.strip() for s in self.alphabet_entry.get().split(','))
         
         # Add epsilon to valid symbols if needed
         valid_symbols = alphabet_set | {'eps', 'epsilon', 'ε'}
         
-        for line_num, line in enumerate(text.strip().split("\n"), 1):
+        for line_num, line in enumerate(text.strip().splitlines(), 1):
             if not line.strip():  # Skip empty lines
                 continue
                 
-            parts = line.split("->")
-            if len(parts) != 2:
+            if line.count("->") != 1:
                 raise ValueError(f"Invalid transition format at line {line_num}: {line}\n"
                                f"Expected format: state,symbol -> next_state")
 
-            left = parts[0].strip()
-            right = parts[1].strip()
-
-            try:
-                state, symbol = left.split(",")
-            except ValueError:
+            match = _TRANSITION_RE.match(line)
+            if not match:
                 raise ValueError(f"Invalid transition format at line {line_num}: {line}\n"
                                f"Left side must contain exactly one state and one symbol separated by a comma")
 
-            state = state.strip()
-            symbol = symbol.strip().lower()
-            next_state = right.strip()
+            state, symbol, next_state = match.groups()
+            symbol = symbol.lower()
 
             # Validate current state
             if state not in state_set:
@@ -290,19 +530,23 @@ class FiniteAutomatonGUI:
 
             transitions[state][symbol].append(next_state)
 
-        return transitions
+        # Freeze targets into tuples, dropping repeated lines while keeping their order
+        return {state: {symbol: tuple(dict.fromkeys(targets)) for symbol, targets in edges.items()}
+                for state, edges in transitions.items()}
 
     def simulate_automaton(self):
         try:
-            # Clear any existing graph
+            # Clear any existing graph, and any render still in flight for it
             self.graph_label.config(image='')
+            self._render_generation += 1
             self.automaton_type_label.config(text="")
 
             # Validate basic inputs first
             states, alphabet, start_state, accept_states = self.validate_basic_inputs()
 
             # Parse transitions with enhanced error handling
-            transitions = self.parse_transitions(self.transitions_text.get("1.0", "end-1c"))
+            transitions = self.parse_transitions(self.transitions_text.get("1.0", "end-1c"),
+                                                 frozenset(states), frozenset(alphabet))
 
             # Initialize automaton (this will validate transitions)
             automaton = FiniteAutomaton(states, alphabet, transitions, start_state, accept_states)
@@ -315,9 +559,8 @@ class FiniteAutomatonGUI:
             
             self.automaton_type_label.config(text=f"This automaton is a {automaton_type}")
 
-            # Visualize
-            graph_image = automaton.visualize(filename="automaton")
-            self.display_graph(graph_image)
+            # Visualize in the background; the result doesn't depend on the picture
+            self.start_render(automaton)
 
             # Simulate if input string is provided
             input_string = self.input_string_entry.get().strip()
@@ -335,9 +578,40 @@ class FiniteAutomatonGUI:
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred: {str(e)}")
 
-    def display_graph(self, graph_image):
-        image = Image.open(graph_image)
-        photo = ImageTk.PhotoImage(image)
+    def start_render(self, automaton):
+        """Render the automaton on a worker thread and show it when ready."""
+        threading.Thread(target=self._render_and_display,
+                         args=(automaton, self._render_generation), daemon=True).start()
+
+    def _render_and_display(self, automaton, generation):
+        # Runs off the Tk thread: only Graphviz and PIL work here, widgets are
+        # touched through root.after on the Tk thread
+        try:
+            graph_image = automaton.visualize(filename="automaton")
+            image = None
+            if graph_image not in self._image_cache:
+                image = Image.open(graph_image)
+                image.load()
+        except Exception as e:
+            message = f"An error occurred while rendering the graph: {str(e)}"
+            self.root.after(0, self._show_render_error, message, generation)
+            return
+
+        self.root.after(0, self._show_render, graph_image, image, generation)
+
+    def _show_render(self, graph_image, image, generation):
+        if generation == self._render_generation:
+            self.display_graph(graph_image, image)
+
+    def _show_render_error(self, message, generation):
+        if generation == self._render_generation:
+            messagebox.showerror("Error", message)
+
+    def display_graph(self, graph_image, image=None):
+        photo = self._image_cache.get(graph_image)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image if image is not None else Image.open(graph_image))
+            self._image_cache[graph_image] = photo
         self.graph_label.config(image=photo)
         self.graph_label.image = photo
 
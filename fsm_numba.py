@@ -0,0 +1,70 @@
+"""Numba-compiled simulation loops for FiniteAutomaton.
+
+Numba is optional. When it is not installed NUMBA_AVAILABLE is False and
+FiniteAutomaton keeps using its pure-Python loop.
+"""
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:
+    NUMBA_AVAILABLE = False
+else:
+    NUMBA_AVAILABLE = True
+
+DEAD = -1
+# NFA state sets are packed into a signed 64-bit bitmask
+MAX_NFA_STATES = 63
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _simulate_dfa(dfa_table, start, accepting, symbols):
+        state = start
+        for i in range(symbols.shape[0]):
+            state = dfa_table[state, symbols[i]]
+            if state == DEAD:
+                return False
+        return accepting[state]
+
+    @njit(cache=True)
+    def _simulate_nfa(move_bits, start_bits, accept_mask, symbols):
+        num_states = move_bits.shape[1]
+        current = start_bits
+        for i in range(symbols.shape[0]):
+            move = move_bits[symbols[i]]
+            next_bits = np.int64(0)
+            for state in range(num_states):
+                if (current >> state) & 1:
+                    next_bits |= move[state]
+
+            if next_bits == 0:
+                return False
+            current = next_bits
+        return (current & accept_mask) != 0
+
+
+def make_dfa_runner(dfa_table, start_id, accept_bits):
+    """Build a compiled DFA runner taking an array of symbol ids."""
+    if not NUMBA_AVAILABLE:
+        return None
+
+    table = np.array(dfa_table, dtype=np.int32).reshape(len(dfa_table), -1)
+    accepting = np.array([(accept_bits >> i) & 1 for i in range(len(dfa_table))], dtype=np.bool_)
+
+    def run(symbols):
+        return bool(_simulate_dfa(table, start_id, accepting, np.asarray(symbols, dtype=np.int32)))
+    return run
+
+
+def make_nfa_runner(move_bits, start_bits, accept_bits):
+    """Build a compiled NFA runner, or None if the state set does not fit in 64 bits."""
+    num_states = len(move_bits[0]) if move_bits else 0
+    if not NUMBA_AVAILABLE or num_states > MAX_NFA_STATES:
+        return None
+
+    move_table = np.array(move_bits, dtype=np.int64).reshape(len(move_bits), num_states)
+    start_mask = np.int64(start_bits)
+    accept_mask = np.int64(accept_bits)
+
+    def run(symbols):
+        return bool(_simulate_nfa(move_table, start_mask, accept_mask, np.asarray(symbols, dtype=np.int32)))
+    return run